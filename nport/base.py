@@ -2,7 +2,7 @@
 from __future__ import division
 
 import numpy as np
-from scipy import interpolate
+from scipy.ndimage import uniform_filter1d
 
 
 # parameter matrix types
@@ -24,6 +24,27 @@ ABCD = TRANSMISSION = TYPE_ABCD = 'ABCD'
         #~ return "given type %s does not match expected type %s" % (self.given, self.expected)
 
 
+def merge_freqs(freqs1, freqs2):
+    """Merge two sorted lists of frequencies, keeping only the frequencies
+    within the range covered by both lists
+    
+    :param freqs1: first list of frequencies
+    :type freqs1: iterable of :class:`float`
+    :param freqs2: second list of frequencies
+    :type freqs2: iterable of :class:`float`
+    :returns: sorted frequencies, without duplicates
+    :rtype: :class:`ndarray`
+    
+    """
+    freqs1 = np.asarray(freqs1)
+    freqs2 = np.asarray(freqs2)
+    min_freq = max(freqs1[0], freqs2[0])
+    max_freq = min(freqs1[-1], freqs2[-1])
+    result = np.union1d(freqs1, freqs2)
+    return result[result.searchsorted(min_freq):
+                  result.searchsorted(max_freq, side='right')]
+
+
 class NPortMatrixBase(np.ndarray):
     """Base class representing an n-port matrix (Z, Y, S, T, G, H or ABCD)
     
@@ -177,16 +198,14 @@ class NPortBase(NPortMatrixBase):
                         result_z0 = this.z0
                     else:
                         raise ValueError("operands have different types")
-                    min_freq = max(this.freqs[0], other.freqs[0])
-                    max_freq = min(this.freqs[-1], other.freqs[-1])
-                    result_freqs = list(set(this.freqs).union(set(other.freqs)))
-                    result_freqs.sort()
-                    result_freqs = \
-                        np.array(result_freqs[result_freqs.index(min_freq):
-                                              result_freqs.index(max_freq)+1])
-                    this_matrices = this.at(result_freqs)
-                    other_matrices = other.at(result_freqs)
-                    result_matrices = func(this_matrices, other_matrices)
+                    if np.array_equal(this.freqs, other.freqs):
+                        result_freqs = this.freqs
+                        result_matrices = func(this, other)
+                    else:
+                        result_freqs = merge_freqs(this.freqs, other.freqs)
+                        this_matrices = this.at(result_freqs)
+                        other_matrices = other.at(result_freqs)
+                        result_matrices = func(this_matrices, other_matrices)
                 else:
                     result_freqs = this.freqs
                     result_matrices = func(this, other)
@@ -204,10 +223,11 @@ class NPortBase(NPortMatrixBase):
         return P
 
     def __new__(cls, freqs, matrices, type, z0=None):
+        matrices = np.asarray(matrices, dtype=complex)
         if len(freqs) != len(matrices):
             raise ValueError("the list of frequencies and the list of "
                              "matrices should have equal lenghts")
-        if matrices[0].shape[0] != matrices[0].shape[1]:
+        if matrices.ndim < 3 or matrices.shape[1] != matrices.shape[2]:
             raise ValueError("the matrices should be square")
         obj = super(NPortBase, cls).__new__(cls, matrices, type, z0)
         obj.freqs = np.asarray(freqs)
@@ -218,7 +238,7 @@ class NPortBase(NPortMatrixBase):
         self.freqs = getattr(obj, 'freqs', None)
 
     def __getitem__(self, index):
-        if type(index) == int:
+        if isinstance(index, (int, np.integer)):
             return self.matrix_cls(np.asarray(self)[index], self.type, self.z0)
         else:
             return np.asarray(self).__getitem__(index)
@@ -238,6 +258,30 @@ class NPortBase(NPortMatrixBase):
         super(NPortBase, self).__setstate__(super_state)
         self.freqs, = own_state
 
+    def _insert(self, freq, matrix):
+        """Return this n-port's frequencies and matrices with `freq` and
+        `matrix` inserted, keeping the frequencies sorted
+        
+        :param freq: frequency at which to insert `matrix`
+        :type freq: :class:`float`
+        :param matrix: matrix to insert at `freq`
+        :type matrix: complex array
+        :returns: frequencies and matrices
+        :rtype: :class:`tuple` of :class:`ndarray`\s
+        
+        """
+        index = self.freqs.searchsorted(freq)
+        result = []
+        for array, value in ((self.freqs, freq), (np.asarray(self), matrix)):
+            value = np.asarray(value)
+            inserted = np.empty((len(array) + 1, ) + array.shape[1:],
+                                dtype=np.result_type(array, value))
+            inserted[:index] = array[:index]
+            inserted[index] = value
+            inserted[index + 1:] = array[index:]
+            result.append(inserted)
+        return tuple(result)
+
     @property
     def parameters(self):
         """Return an iterator over the parameters in row-major order
@@ -286,6 +330,9 @@ class NPortBase(NPortMatrixBase):
         * list of frequencies (`freqs` is iterable), or
         * at a single frequency (`freqs` is a value)
         
+        If `freqs` equals this n-port's list of frequencies, no interpolation
+        is performed and a copy of this n-port is returned.
+        
         :param freqs: frequency point or list of frequencies at which to return
                       the n-port matrices
         :type freqs: :class:`float` or iterable of :class:`float`s
@@ -299,9 +346,18 @@ class NPortBase(NPortMatrixBase):
         except TypeError:
             single = True
             freqs = [freqs]
+        freqs = np.asarray(freqs, dtype=float)
+        if not single and np.array_equal(freqs, self.freqs):
+            return self.copy()
+        if len(self.freqs) < 2:
+            raise ValueError("interpolation requires at least two frequency "
+                             "samples")
+        if (np.any(freqs < self.freqs[0]) or
+            np.any(freqs > self.freqs[-1])):
+            raise ValueError("a frequency lies outside of the interpolation "
+                             "range")
         subclass = type(self)
-        func = interpolate.interp1d(self.freqs, self, axis=0)
-        interpolated = func(freqs)
+        interpolated = self._interpolate(freqs)
         interpolated_nport = subclass(freqs, interpolated, self.type, self.z0)
         if single:
             return interpolated_nport[0]
@@ -316,22 +372,31 @@ class NPortBase(NPortMatrixBase):
         :rtype: `type(self)`
         
         """
-        averaged = np.zeros_like(np.asarray(self))
-        for i in range(len(self)):
-            for j in range(- int(np.floor(n/2)), int(np.ceil(n/2))):
-                index = i + j
-                if index < 0:
-                    index = 0
-                elif index >= len(self):
-                    index = len(self) - 1
-                averaged[i] += self[index] / n        
-        # numpy convolve
-        #~ ones = np.ones(n) / n
-        #~ averaged = np.zeros_like(np.asarray(self))
-        #~ for i in range(self.ports):
-            #~ for j in range(self.ports):
-                #~ averaged[:, i, j] = np.convolve(ones, self[:, i, j])
-        # or scipy convolve
-        #~ averaged = scipy.signal.convolve(np.ones((n, ) + self.shape[1:])/n, np.asarray(self), 'same')
+        # boxcar filter; the edges are padded by replicating the first and
+        # last matrices (uniform_filter1d only handles real data)
+        matrices = np.asarray(self)
+        averaged = np.empty_like(matrices)
+        averaged.real = uniform_filter1d(matrices.real, n, axis=0,
+                                         mode='nearest')
+        averaged.imag = uniform_filter1d(matrices.imag, n, axis=0,
+                                         mode='nearest')
         subclass = type(self)
         return subclass(self.freqs, averaged, self.type, self.z0)
+
+    def _interpolate(self, freqs):
+        """Linearly interpolate this n-port's matrices at the given
+        frequencies
+        
+        :param freqs: frequencies within the range of this n-port
+        :type freqs: :class:`ndarray`
+        :rtype: :class:`ndarray`
+        
+        """
+        matrices = np.asarray(self)
+        index = np.clip(self.freqs.searchsorted(freqs, 'right') - 1,
+                        0, len(self.freqs) - 2)
+        lower = self.freqs[index]
+        upper = self.freqs[index + 1]
+        shape = (-1, ) + (1, ) * (matrices.ndim - 1)
+        t = ((freqs - lower) / (upper - lower)).reshape(shape)
+        return (1 - t) * matrices[index] + t * matrices[index + 1]
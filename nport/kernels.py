@@ -0,0 +1,56 @@
+"""Compiled kernels for operations on arrays of n-port matrices
+
+These kernels require numba. Numba is only imported, and the kernels are only
+compiled, on first use. If numba is not available, :func:`twonport_dot`
+returns `None` and the callers fall back to plain numpy.
+
+"""
+
+# up to this submatrix size, the block multiplication kernel outperforms a
+# batched matrix multiplication of the equivalent 2n by 2n matrices, also on a
+# single CPU; for larger sizes, numpy's matmul is as fast or faster
+TWONPORT_DOT_MAX_SIZE = 3
+
+
+_twonport_dot = None
+_compiled = False
+
+
+def _twonport_dot_python(left, right, out):
+    freqs = left.shape[0]
+    n = left.shape[3]
+    for f in range(freqs):
+        for i in range(2):
+            for j in range(2):
+                for row in range(n):
+                    for column in range(n):
+                        total = 0j
+                        for k in range(2):
+                            for m in range(n):
+                                total += (left[f, i, k, row, m] *
+                                          right[f, k, j, m, column])
+                        out[f, i, j, row, column] = total
+
+
+def twonport_dot():
+    """Return the compiled 2n-port block multiplication kernel, compiling it
+    on the first call
+
+    The kernel is called as ``kernel(left, right, out)`` and multiplies the
+    2x2 block matrices `left` and `right` (F by 2 by 2 by *n* by *n* complex
+    arrays), element-wise in the first (frequency) dimension, storing the
+    result in `out`. The compiled kernel is cached on disk, so only the first
+    process using it pays the compilation cost.
+
+    :returns: the kernel, or `None` if numba is not available
+
+    """
+    global _twonport_dot, _compiled
+    if not _compiled:
+        _compiled = True
+        try:
+            import numba
+        except ImportError:
+            return None
+        _twonport_dot = numba.njit(cache=True)(_twonport_dot_python)
+    return _twonport_dot
@@ -5,8 +5,9 @@ import numpy as np
 
 from .base import Z, Y, S, T, H, G, ABCD
 from .base import IMPEDANCE, ADMITTANCE, SCATTERING
-from .base import NPortMatrixBase, NPortBase
+from .base import NPortMatrixBase, NPortBase, merge_freqs
 from .parameter import rad
+from . import kernels
 
 
 class NPortMatrix(NPortMatrixBase):
@@ -60,44 +61,7 @@ class NPortMatrix(NPortMatrixBase):
         :rtype: :class:`TwoNPortMatrix`
         
         """
-        if self.ports % 2 != 0:
-            raise TypeError("this NPortMatrix' number of ports is not a "
-                            "multiple of 2")
-        n = int(self.ports / 2)
-        if inports is None and outports is None:
-            inports = range(n)
-            outports = range(n, 2*n)
-            matrix = self
-        else:
-            # check whether the given sets of ports are valid
-            assert inports is not None and outports is not None
-            assert len(inports) == n
-            assert len(outports) == n
-            allports = set(inports).union(set(outports))
-            assert len(allports) == 2*n
-            assert min(allports) == 1 and max(allports) == 2*n
-            inports = [port - 1 for port in inports]
-            outports = [port - 1 for port in outports]
-
-            ports = inports + outports
-
-            # shuffle rows and columns to obtain 2n-port format
-            matrix = []
-            for row in ports:
-                matrix.append(self[row])
-            matrix = np.asarray(matrix).T
-            matrix2 = []
-            for column in ports:
-                matrix2.append(matrix[column])
-            matrix = np.asarray(matrix2).T
-
-        # TODO: rewrite using reshape()?
-        matrix = np.asmatrix(matrix)
-        x11 = matrix[0:n  , 0:n  ]
-        x12 = matrix[0:n  , n:2*n]
-        x21 = matrix[n:2*n, 0:n  ]
-        x22 = matrix[n:2*n, n:2*n]
-        matrix = np.array([[x11, x12], [x21, x22]])
+        matrix = _twonport_matrices(np.asarray(self), inports, outports)
         return TwoNPortMatrix(matrix, self.type, self.z0)
 
     def reverse(self):
@@ -117,19 +81,14 @@ class NPortMatrix(NPortMatrixBase):
         :rtype: :class:`NPortMatrix`
         
         """
-        # http://qucs.sourceforge.net/tech/node98.html
-        # "Renormalization of S-parameters to different port impedances"
         if self.type not in (S, T):
             raise TypeError("Only S and T matrices can be renormalized")
 
         if z0 == self.z0:
             result = self
         elif self.type == S:
-            idty = np.identity(len(self), dtype=complex)
-
-            r = (z0 - self.z0) / (z0 + self.z0)
-            result = self.__class__(np.dot(self - idty * r,
-                                           np.linalg.inv(idty - r * self)),
+            result = self.__class__(_renormalize_all(np.asarray(self),
+                                                     self.z0, z0),
                                     self.type, z0)
         elif self.type == T:
             result = self.convert(S, z0).convert(T)
@@ -155,8 +114,6 @@ class NPortMatrix(NPortMatrixBase):
         #  * MATLAB S-parameter toolbox (Z, Y, H, G, ABCD, T)
         #           http://www.mathworks.com/matlabcentral/fileexchange/6080
         z0 = self.convert_z0test(type, z0)
-        idty = np.identity(len(self), dtype=complex)
-        invert = np.linalg.inv
 
         if type in (ABCD, T):
             raise TypeError("Cannot convert an NPort to %s-parameter "
@@ -169,29 +126,7 @@ class NPortMatrix(NPortMatrixBase):
         elif type not in (Z, Y, S):
             raise TypeError("Unknown n-port parameter type")
 
-        # TODO: check for singularities
-        if self.type == SCATTERING:
-            if type == SCATTERING:
-                return self.renormalize(z0)
-            elif type == IMPEDANCE:
-                result = (2 * invert(idty - self) - idty) * self.z0
-            elif type == ADMITTANCE:
-                result = (2 * invert(idty + self) - idty) / self.z0
-        elif self.type == IMPEDANCE:
-            if type == SCATTERING:
-                result = idty - 2 * invert(idty + self / z0)
-            elif type == ADMITTANCE:
-                result = invert(self)
-            elif type == IMPEDANCE:
-                result = self
-        elif self.type == ADMITTANCE:
-            if type == SCATTERING:
-                result = 2 * invert(idty + self * z0) - idty
-            elif type == IMPEDANCE:
-                result = invert(self)
-            elif type == ADMITTANCE:
-                result = self
-
+        result = _convert_all(np.asarray(self), self.type, type, self.z0, z0)
         return NPortMatrix(result, type, z0)
 
     def submatrix(self, ports):
@@ -233,27 +168,8 @@ class NPortMatrix(NPortMatrixBase):
 
         """
         if self.type == IMPEDANCE:
-            m = []
-            for i, ports in enumerate(portsets):
-                row = [0 for port in range(self.ports)]
-                try:
-                    if isinstance(ports, tuple):
-                        assert len(ports) == 2
-                        row[ports[0] - 1] = 1
-                        row[ports[1] - 1] = -1
-                    else:
-                        assert isinstance(ports, int)
-                        assert ports != 0
-                        if ports > 0:
-                            row[ports - 1] = 1
-                        else:
-                            row[-ports - 1] = -1
-                except IndexError:
-                    raise IndexError("specified port number is higher than "
-                                     "number of ports")
-                m.append(row)
-            m = np.matrix(m, dtype=float)
-            result = m * np.asarray(self) * m.T
+            m = _recombination_matrix(portsets, self.ports)
+            result = np.dot(np.dot(m, np.asarray(self)), m.T)
             return self.__class__(result, self.type, self.z0)
         else:
             z_recombined = self.convert(IMPEDANCE).recombine(portsets)
@@ -278,36 +194,9 @@ class NPortMatrix(NPortMatrixBase):
         * port 3 is original ports 4, 5 and 6 connected together
 
         """
-        # TODO: should be possible with m * self * m.T transformation, no?
         if self.type == ADMITTANCE:
-            # columns
-            tmp = np.zeros((self.ports, len(portsets)), dtype=complex)
-            for i, ports in enumerate(portsets):
-                try:
-                    if isinstance(ports, tuple):
-                        ports = [port - 1 for port in ports]
-                        tmp[:, i] = np.sum(self[:, ports], 1)
-                    else:
-                        assert isinstance(ports, int)
-                        assert ports > 0
-                        tmp[:, i] = self[:, ports - 1]
-                except IndexError:
-                    raise IndexError("specified port number is higher than "
-                                     "number of ports")
-            # rows
-            result = np.zeros((len(portsets), len(portsets)), dtype=complex)
-            for i, ports in enumerate(portsets):
-                try:
-                    if isinstance(ports, tuple):
-                        ports = [port - 1 for port in ports]
-                        result[i, :] = np.sum(tmp[ports, :], 0)
-                    else:
-                        assert isinstance(ports, int)
-                        assert ports > 0
-                        result[i, :] = tmp[ports - 1, :]
-                except IndexError:
-                    raise IndexError("specified port number is higher than "
-                                     "number of ports")
+            m = _shunt_matrix(portsets, self.ports)
+            result = np.dot(np.dot(m, np.asarray(self)), m.T)
             return self.__class__(result, self.type, self.z0)
         else:
             y_shunted = self.convert(ADMITTANCE).shunt(portsets)
@@ -337,8 +226,7 @@ class NPortMatrix(NPortMatrixBase):
             for i, port in enumerate(portmap):
                 if port != 0:
                     t[i, port - 1] = 1
-            t = np.matrix(t, dtype=float)
-            other_reshape = t * np.asarray(other) * t.T
+            other_reshape = np.dot(np.dot(t, np.asarray(other)), t.T)
             return self.__class__(self + other_reshape, self.type, self.z0)
         else:
             y_paralleled = self.convert(ADMITTANCE).parallel(other, portmap)
@@ -351,9 +239,9 @@ class NPortMatrix(NPortMatrixBase):
         
         """
         if self.type != SCATTERING:
-            return self.convert(SCATTERING).ispassive()
+            return self.convert(SCATTERING).is_passive()
         else:
-            return np.max(np.sum(np.abs(np.asarray(self))**2, 1)) <= 1
+            return _is_passive_all(np.asarray(self))
 
     def is_reciprocal(self):
         """Check whether this n-port matrix is reciprocal
@@ -390,10 +278,10 @@ class NPort(NPortBase):
     
     def __new__(cls, freqs, matrices, type, z0=None):
         matrices = np.asarray(matrices, dtype=complex)
-        obj = NPortBase.__new__(cls, freqs, matrices, type, z0)
-        if len(obj[0].shape) != 2:
+        if matrices.ndim != 3:
             raise ValueError("the matrices should be two-dimensional")
-        if obj[0].shape[0] == 2:
+        obj = NPortBase.__new__(cls, freqs, matrices, type, z0)
+        if matrices.shape[1] == 2:
             obj.__class__ = TwoPort
         return obj
 
@@ -404,7 +292,7 @@ class NPort(NPortBase):
         :rtype: :class:`int`
         
         """
-        return self[0].ports
+        return self.shape[-1]
 
     def power(self, n):
         """Return this :class:`NPort`\'s matrices raised to the `n`\ th power
@@ -412,7 +300,7 @@ class NPort(NPortBase):
         :rtype: :class:`NPort`
         
         """
-        matrices = [np.linalg.matrix_power(m, n) for m in self]
+        matrices = np.linalg.matrix_power(np.asarray(self), n)
         return self.__class__(self.freqs, matrices, self.type, self.z0)
 
     def add(self, freq, matrix):
@@ -430,12 +318,10 @@ class NPort(NPortBase):
         :class:`NPort`.
 
         """
-        if type(matrix) == NPortMatrix:
+        if isinstance(matrix, NPortMatrix):
             if matrix.type != self.type or matrix.z0 != self.z0:
                 matrix = matrix.convert(self.type, self.z0)
-        index = self.freqs.searchsorted(freq)
-        freqs = np.insert(self.freqs, index, freq)
-        matrices = np.insert(self.matrices, index, matrix, 0)
+        freqs, matrices = self._insert(freq, matrix)
         return self.__class__(freqs, matrices, self.type, self.z0)
 
     def twonport(self, inports=None, outports=None):
@@ -449,7 +335,8 @@ class NPort(NPortBase):
         :rtype: :class:`TwoNPort`
 
         """
-        twonportmatrices = [m.twonportmatrix(inports, outports) for m in self]
+        twonportmatrices = _twonport_matrices(np.asarray(self), inports,
+                                              outports)
         return TwoNPort(self.freqs, twonportmatrices, self.type, self.z0)
 
     def renormalize(self, z0):
@@ -466,7 +353,10 @@ class NPort(NPortBase):
         if z0 == self.z0:
             result = self
         else:
-            renormalized = [matrix.renormalize(z0) for matrix in self]
+            if self.type == S:
+                renormalized = _renormalize_all(np.asarray(self), self.z0, z0)
+            else:
+                renormalized = [matrix.renormalize(z0) for matrix in self]
             result = self.__class__(self.freqs, renormalized, self.type, z0)
         return result
 
@@ -490,7 +380,12 @@ class NPort(NPortBase):
         :type z0: :class:`float`
 
         """
-        converted = [matrix.convert(type, z0) for matrix in self]
+        z0 = self.convert_z0test(type, z0)
+        if self.type in (Z, Y, S) and type in (Z, Y, S):
+            converted = _convert_all(np.asarray(self), self.type, type,
+                                     self.z0, z0)
+        else:
+            converted = [matrix.convert(type, z0) for matrix in self]
         return NPort(self.freqs, converted, type, z0)
 
     def submatrix(self, ports):
@@ -515,7 +410,7 @@ class NPort(NPortBase):
 
         """
         # TODO: determine type of output
-        inverted = [np.linalg.inv(matrix) for matrix in self]
+        inverted = np.linalg.inv(np.asarray(self))
         return NPort(self.freqs, inverted, self.type, self.z0)
 
     def recombine(self, portsets):
@@ -541,9 +436,13 @@ class NPort(NPortBase):
         * port 4 is original port 6, but with reversed polarity
 
         """
-        recombined = [matrix.recombine(portsets) for matrix in self]
-        return self.__class__(self.freqs, recombined,
-                              recombined[0].type, recombined[0].z0)
+        if self.type == IMPEDANCE:
+            z = np.asarray(self)
+        else:
+            z = np.asarray(self.convert(IMPEDANCE))
+        m = _recombination_matrix(portsets, self.ports)
+        recombined = np.einsum('ij,fjk,lk->fil', m, z, m)
+        return self.__class__(self.freqs, recombined, IMPEDANCE)
 
     def shunt(self, portsets):
         """Connect ports together, reducing the number of ports of this
@@ -564,9 +463,13 @@ class NPort(NPortBase):
         * port 3 is original ports 4, 5 and 6 connected together
 
         """
-        shunted = [matrix.shunt(portsets) for matrix in self]
-        return self.__class__(self.freqs, shunted,
-                              shunted[0].type, shunted[0].z0)
+        if self.type == ADMITTANCE:
+            y = np.asarray(self)
+        else:
+            y = np.asarray(self.convert(ADMITTANCE))
+        m = _shunt_matrix(portsets, self.ports)
+        shunted = np.einsum('ij,fjk,lk->fil', m, y, m)
+        return self.__class__(self.freqs, shunted, ADMITTANCE)
 
     def parallel(self, other, portmap=None):
         """Connect `other` in parallel with this :class:`NPort`.
@@ -593,10 +496,10 @@ class NPort(NPortBase):
         :rtype: :class:`bool`
         
         """
-        for matrix in self:
-            if not matrix.is_passive():
-                return False
-        return True
+        if self.type != SCATTERING:
+            return self.convert(SCATTERING).is_passive()
+        else:
+            return _is_passive_all(np.asarray(self))
 
     def group_delay(self, port1, port2):
         """Return the group delay of the parameter as specified by the indices
@@ -618,6 +521,201 @@ class NPort(NPortBase):
         return - dphase / (2 * np.pi * dfreq)
 
 
+_identities = {}
+
+def _identity(n):
+    """Return a read-only complex *n* by *n* identity matrix. The matrix is
+    created only once for each `n`.
+
+    :param n: size of the identity matrix
+    :type n: :class:`int`
+    :rtype: :class:`ndarray`
+
+    """
+    try:
+        idty = _identities[n]
+    except KeyError:
+        idty = np.identity(n, dtype=complex)
+        idty.flags.writeable = False
+        _identities[n] = idty
+    return idty
+
+
+def _convert_all(matrices, type, new_type, z0, new_z0):
+    """Convert Z, Y or S `matrices` of `type` to `new_type`. `matrices` can be
+    a single *n* by *n* array or an array of those, in which case all matrices
+    are converted at once.
+
+    :param matrices: matrices to convert
+    :type matrices: :class:`ndarray`
+    :param type: type of `matrices`
+    :type type: :data:`Z`, :data:`Y` or :data:`S`
+    :param new_type: type to convert to
+    :type new_type: :data:`Z`, :data:`Y` or :data:`S`
+    :param z0: normalizing impedance of `matrices` (only :data:`S`)
+    :type z0: :class:`float`
+    :param new_z0: normalizing impedance to convert to (only :data:`S`)
+    :type new_z0: :class:`float`
+    :rtype: :class:`ndarray`
+
+    """
+    idty = _identity(matrices.shape[-1])
+    invert = np.linalg.inv
+
+    # the arithmetic following the inversions is performed in-place on the
+    # inverse to avoid allocating temporary arrays
+    # TODO: check for singularities
+    if type == SCATTERING:
+        if new_type == SCATTERING:
+            result = _renormalize_all(matrices, z0, new_z0)
+        elif new_type == IMPEDANCE:
+            result = invert(idty - matrices)
+            result *= 2
+            result -= idty
+            result *= z0
+        elif new_type == ADMITTANCE:
+            result = invert(idty + matrices)
+            result *= 2
+            result -= idty
+            result /= z0
+    elif type == IMPEDANCE:
+        if new_type == SCATTERING:
+            result = invert(idty + matrices / new_z0)
+            result *= -2
+            result += idty
+        elif new_type == ADMITTANCE:
+            result = invert(matrices)
+        elif new_type == IMPEDANCE:
+            result = matrices.copy()
+    elif type == ADMITTANCE:
+        if new_type == SCATTERING:
+            result = invert(idty + matrices * new_z0)
+            result *= 2
+            result -= idty
+        elif new_type == IMPEDANCE:
+            result = invert(matrices)
+        elif new_type == ADMITTANCE:
+            result = matrices.copy()
+    return result
+
+
+def _renormalize_all(matrices, z0, new_z0):
+    """Renormalize S `matrices` from `z0` to `new_z0`. `matrices` can be a
+    single *n* by *n* array or an array of those.
+
+    :rtype: :class:`ndarray`
+
+    """
+    # http://qucs.sourceforge.net/tech/node98.html
+    # "Renormalization of S-parameters to different port impedances"
+    if new_z0 == z0:
+        return matrices.copy()
+    idty = _identity(matrices.shape[-1])
+    r = (new_z0 - z0) / (new_z0 + z0)
+    return np.matmul(matrices - idty * r, np.linalg.inv(idty - r * matrices))
+
+
+def _twonport_matrices(matrices, inports=None, outports=None):
+    """Rearrange 2n-port `matrices` into 2 by 2 block matrices with `inports` as
+    the input ports and `outports` as the output ports. `matrices` can be a
+    single 2n by 2n array or an array of those, in which case the same
+    reordering is applied to all matrices at once.
+
+    :param inports: the list of ports that make up the inputs of the 2n-port
+    :type inports: :class:`tuple` or :class:`list`
+    :param outports: the list of ports that make up the outputs
+    :type outports: :class:`tuple` or :class:`list`
+    :rtype: :class:`ndarray`
+
+    """
+    ports = matrices.shape[-1]
+    if ports % 2 != 0:
+        raise TypeError("the number of ports is not a multiple of 2")
+    n = int(ports / 2)
+    if inports is not None or outports is not None:
+        # check whether the given sets of ports are valid
+        assert inports is not None and outports is not None
+        assert len(inports) == n
+        assert len(outports) == n
+        allports = set(inports).union(set(outports))
+        assert len(allports) == 2*n
+        assert min(allports) == 1 and max(allports) == 2*n
+        indices = np.array([port - 1 for port in inports] +
+                           [port - 1 for port in outports])
+
+        # shuffle rows and columns to obtain 2n-port format
+        matrices = matrices[..., indices[:, None], indices]
+
+    shape = matrices.shape[:-2] + (2, n, 2, n)
+    return matrices.reshape(shape).swapaxes(-3, -2).copy()
+
+
+def _is_passive_all(matrices):
+    """Check whether all S `matrices` are passive. `matrices` can be a single
+    *n* by *n* array or an array of those.
+
+    :rtype: :class:`bool`
+
+    """
+    # squared magnitudes summed along the rows, without computing abs()**2
+    power = np.einsum('...ij,...ij->...i', matrices, matrices.conj()).real
+    return power.max() <= 1
+
+
+def _recombination_matrix(portsets, num_ports):
+    """Return the matrix M that recombines the ports of an *n*-port Z-matrix
+    as M * Z * M.T. See :meth:`NPortMatrix.recombine` for `portsets`.
+
+    :param num_ports: number of ports *n*
+    :type num_ports: :class:`int`
+    :rtype: :class:`ndarray`
+
+    """
+    m = np.zeros((len(portsets), num_ports), dtype=float)
+    for i, ports in enumerate(portsets):
+        try:
+            if isinstance(ports, tuple):
+                assert len(ports) == 2
+                m[i, ports[0] - 1] = 1
+                m[i, ports[1] - 1] = -1
+            else:
+                assert isinstance(ports, int)
+                assert ports != 0
+                if ports > 0:
+                    m[i, ports - 1] = 1
+                else:
+                    m[i, -ports - 1] = -1
+        except IndexError:
+            raise IndexError("specified port number is higher than "
+                             "number of ports")
+    return m
+
+
+def _shunt_matrix(portsets, num_ports):
+    """Return the matrix M that connects together ports of an *n*-port Y-matrix
+    as M * Y * M.T. See :meth:`NPortMatrix.shunt` for `portsets`.
+
+    :param num_ports: number of ports *n*
+    :type num_ports: :class:`int`
+    :rtype: :class:`ndarray`
+
+    """
+    m = np.zeros((len(portsets), num_ports), dtype=float)
+    for i, ports in enumerate(portsets):
+        try:
+            if isinstance(ports, tuple):
+                for port in ports:
+                    m[i, port - 1] += 1
+            else:
+                assert isinstance(ports, int)
+                assert ports > 0
+                m[i, ports - 1] = 1
+        except IndexError:
+            raise IndexError("specified port number is higher than "
+                             "number of ports")
+    return m
+
+
 def array_dot(arg1, arg2):
     """Matrix multiplication for arrays, element-wise in the first dimension"""
     if arg1.shape != arg2.shape:
@@ -637,44 +735,50 @@ def dot(arg1, arg2):
                  :class:`TwoNPortMatrix` or :class:`ndarray`
     
     """
-    def merge_freqs(freqs1, freqs2):
-        minf = max(freqs1[0], freqs2[0])
-        maxf = min(freqs1[-1], freqs2[-1])
-        result = list(set(freqs1).union(set(freqs2)))
-        result.sort()
-        return np.array(result[result.index(minf):result.index(maxf)])
-    
     if isinstance(arg1, NPort):
         if isinstance(arg2, NPort):
             result_freqs = merge_freqs(arg1.freqs, arg2.freqs)
             arg1_matrices = arg1.at(result_freqs)
             arg2_matrices = arg2.at(result_freqs)
-            result_matrices = np.asarray([np.dot(a, b) for (a, b) in
-                zip(arg1_matrices, arg2_matrices)])
+            result_matrices = np.matmul(np.asarray(arg1_matrices),
+                                        np.asarray(arg2_matrices))
         else:
             result_freqs = arg1.freqs
-            result_matrices = np.array([np.dot(matrix, arg2)
-                                        for matrix in arg1])
+            if np.ndim(arg2) == 2:
+                result_matrices = np.matmul(np.asarray(arg1), arg2)
+            else:
+                # scalars and other operands follow np.dot semantics
+                result_matrices = np.array([np.dot(matrix, arg2)
+                                            for matrix in np.asarray(arg1)])
         return NPort(result_freqs, result_matrices, arg1.type, arg1.z0)
     elif isinstance(arg1, TwoNPort):
         if isinstance(arg2, TwoNPort):
-            def twonport_dot(l, r):
-                a = np.dot(l[0, 0], r[0, 0]) + np.dot(l[0, 1], r[1, 0])
-                b = np.dot(l[0, 0], r[0, 1]) + np.dot(l[0, 1], r[1, 1])
-                c = np.dot(l[1, 0], r[0, 0]) + np.dot(l[1, 1], r[1, 0])
-                d = np.dot(l[1, 0], r[0, 1]) + np.dot(l[1, 1], r[1, 1])
-                return np.asarray([[a, b], [c, d]])
-            
+            def nport_matrices(twonport_matrices):
+                # (F, 2, 2, n, n) block matrices to (F, 2n, 2n) matrices
+                shape = twonport_matrices.shape
+                return (np.asarray(twonport_matrices).swapaxes(2, 3)
+                        .reshape(shape[0], 2 * shape[3], 2 * shape[4]))
+
             result_freqs = merge_freqs(arg1.freqs, arg2.freqs)
-            arg1_matrices = arg1.at(result_freqs)
-            arg2_matrices = arg2.at(result_freqs)
-            result_matrices = np.asarray([twonport_dot(a, b) for (a, b) in
-                zip(arg1_matrices, arg2_matrices)])
+            arg1_matrices = np.asarray(arg1.at(result_freqs))
+            arg2_matrices = np.asarray(arg2.at(result_freqs))
+            n = arg1_matrices.shape[-1]
+            kernel = None
+            if n <= kernels.TWONPORT_DOT_MAX_SIZE:
+                kernel = kernels.twonport_dot()
+            if kernel is not None:
+                result_matrices = np.empty_like(arg1_matrices)
+                kernel(arg1_matrices, arg2_matrices, result_matrices)
+            else:
+                result_matrices = np.matmul(nport_matrices(arg1_matrices),
+                                            nport_matrices(arg2_matrices))
+                result_matrices = (result_matrices.reshape(-1, 2, n, 2, n)
+                                   .swapaxes(2, 3))
         else:
             raise NotImplementedError
         return TwoNPort(result_freqs, result_matrices, arg1.type,
                                  arg1.z0)
-    elif type(arg2) == NPort:
+    elif isinstance(arg2, NPortBase):
         raise NotImplementedError
     else:
         return np.dot(arg1, arg2)
@@ -266,21 +266,13 @@ class TwoNPort(NPortBase):
 
     def __new__(cls, freqs, matrices, type, z0=None):
         matrices = np.asarray(matrices, dtype=complex)
-        obj = NPortBase.__new__(cls, freqs, matrices, type, z0)
-        if len(obj[0].shape) != 4:
+        if matrices.ndim != 5:
             raise ValueError("the matrices should be four-dimensional")
-        if obj[0].shape[0] != 2 or obj[0].shape[0] != obj[0].shape[1]:
+        if matrices.shape[1] != 2 or matrices.shape[1] != matrices.shape[2]:
             raise ValueError("the matrices should be a 2x2 matrix")
-        if obj[0].shape[2] != obj[0].shape[3]:
+        if matrices.shape[3] != matrices.shape[4]:
             raise ValueError("the submatrices should be square")
-        return obj
-
-    def __getitem__(self, arg):
-        if type(arg) == int:
-            return TwoNPortMatrix(np.asarray(self).__getitem__(arg), self.type,
-                                  self.z0)
-        else:
-            return np.asarray(self).__getitem__(arg)
+        return NPortBase.__new__(cls, freqs, matrices, type, z0)
 
     @property
     def ports(self):
@@ -289,7 +281,7 @@ class TwoNPort(NPortBase):
         :rtype: :class:`int`
         
         """
-        return 2 * self[0].shape[2]
+        return 2 * self.shape[3]
 
     def add(self, freq, matrix):
         """Return a :class:`TwoNPort` with the specified frequency sample added.
@@ -306,12 +298,10 @@ class TwoNPort(NPortBase):
         :rtype: :class:`TwoNPort`
 
         """
-        if type(matrix) == TwoNPortMatrix:
+        if isinstance(matrix, TwoNPortMatrix):
             if matrix.type != self.type or matrix.z0 != self.z0:
                 matrix = matrix.convert(self.type, self.z0)
-        index = self.freqs.searchsorted(freq)
-        freqs = np.insert(self.freqs, index, freq)
-        matrices = np.insert(self.matrices, index, matrix, 0)
+        freqs, matrices = self._insert(freq, matrix)
         return TwoNPort(freqs, matrices, self.type, self.z0)
 
     def nport(self):
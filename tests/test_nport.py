@@ -85,6 +85,241 @@ class TestNPort(unittest.TestCase):
         maxerror = convert_convert_renormalize(self.s1, nport.S, 60)
         self.assertAlmostEqual(maxerror, 0, 13)
 
+    # conversion to the same type ----------------------------------------------
+    def test_convert_same_copies(self):
+        for input in (self.z1, self.y1, self.s1):
+            x = input.convert(input.type)
+            self.assertFalse(np.may_share_memory(x, input))
+
+    # interpolation ------------------------------------------------------------
+    def test_at_result_not_shared(self):
+        freqs = [1.5, 2.5]
+        interpolated = self.z1.at(freqs)
+        interpolated[0, 0, 0] = 999
+        maxerror = np.max(np.abs(self.z1.at(freqs)[0, 0, 0] -
+                                 (self.z1[0, 0, 0] + self.z1[1, 0, 0]) / 2))
+        self.assertAlmostEqual(maxerror, 0, 14)
+
+    def test_at_after_inplace_operation(self):
+        freqs = [1.5, 2.5]
+        expected = np.asarray(self.z1.at(freqs)) + 10
+        self.z1 += 10
+        maxerror = np.max(np.abs(self.z1.at(freqs) - expected))
+        self.assertAlmostEqual(maxerror, 0, 14)
+
+    def test_at_after_matrix_modification(self):
+        freqs = [1.5, 2.5]
+        self.z1.at(freqs)
+        self.z1[0][0, 0] = 100
+        maxerror = np.max(np.abs(self.z1.at(freqs)[0, 0, 0] -
+                                 (100 + self.z1[1, 0, 0]) / 2))
+        self.assertAlmostEqual(maxerror, 0, 14)
+
+    def test_at_non_uniform(self):
+        z = nport.NPort([1, 1.5, 4], self.z1, nport.Z)
+        freqs = [1, 1.2, 1.5, 3.1, 4]
+        maxerror = np.max(np.abs(z.at(freqs) - interpolate(z, freqs)))
+        self.assertAlmostEqual(maxerror, 0, 14)
+
+    def test_at_single_frequency(self):
+        maxerror = np.max(np.abs(self.z1.at(2.5) -
+                                 interpolate(self.z1, [2.5])[0]))
+        self.assertAlmostEqual(maxerror, 0, 14)
+
+    def test_at_single_sample(self):
+        z = nport.NPort([1], self.z1[:1], nport.Z)
+        self.assertRaises(ValueError, z.at, 1)
+
+    def test_at_own_frequencies(self):
+        result = self.z1.at([1, 2, 3])
+        self.assertFalse(np.may_share_memory(result, self.z1))
+        self.assertEqual(list(result.freqs), [1, 2, 3])
+        self.assertEqual(result.type, self.z1.type)
+        maxerror = np.max(np.abs(result - self.z1))
+        self.assertAlmostEqual(maxerror, 0, 15)
+
+    def test_at_out_of_range(self):
+        self.assertRaises(ValueError, self.z1.at, [0.5, 2])
+        self.assertRaises(ValueError, self.z1.at, 3.5)
+
+    # matrix power and inverse -------------------------------------------------
+    def test_power(self):
+        for n in (0, 1, 3, -2):
+            result = self.z1.power(n)
+            self.assertEqual(list(result.freqs), [1, 2, 3])
+            expected = [np.linalg.matrix_power(matrix, n)
+                        for matrix in np.asarray(self.z1)]
+            maxerror = np.max(np.abs(result - np.array(expected)) /
+                              np.abs(np.array(expected)).max())
+            self.assertAlmostEqual(maxerror, 0, 14)
+
+    def test_invert(self):
+        result = self.z1.invert()
+        self.assertEqual(result.type, nport.Z)
+        expected = [np.linalg.inv(matrix) for matrix in np.asarray(self.z1)]
+        maxerror = np.max(np.abs(result - np.array(expected)))
+        self.assertAlmostEqual(maxerror, 0, 15)
+
+    # recombining ports --------------------------------------------------------
+    def test_recombine(self):
+        portsets = [(1, 3), (2, 4), -1]
+        result = self.z1.recombine(portsets)
+        self.assertEqual(result.type, nport.Z)
+        maxerror = np.max(np.abs(result - recombine(self.z1, portsets)))
+        self.assertAlmostEqual(maxerror, 0, 14)
+
+    def test_recombine_admittance(self):
+        portsets = [(1, 3), (2, 4), -1]
+        for input in (self.y1, self.s1):
+            result = input.recombine(portsets)
+            self.assertEqual(result.type, nport.Z)
+            expected = recombine(input.convert(nport.Z), portsets)
+            maxerror = np.max(np.abs(result - expected) /
+                              np.abs(expected).max())
+            self.assertAlmostEqual(maxerror, 0, 14)
+
+    def test_recombine_matrix(self):
+        portsets = [(1, 3), (2, 4), -1]
+        for matrix in self.z1:
+            maxerror = np.max(np.abs(matrix.recombine(portsets) -
+                                     recombine(matrix[np.newaxis],
+                                               portsets)[0]))
+            self.assertAlmostEqual(maxerror, 0, 14)
+
+    # shunting ports -----------------------------------------------------------
+    def test_shunt(self):
+        portsets = [3, (1, 4), 2]
+        result = self.y1.shunt(portsets)
+        self.assertEqual(result.type, nport.Y)
+        maxerror = np.max(np.abs(result - shunt(self.y1, portsets)))
+        self.assertAlmostEqual(maxerror, 0, 14)
+
+    def test_shunt_impedance(self):
+        portsets = [(2, 3), (1, 4)]
+        result = self.z1.shunt(portsets)
+        self.assertEqual(result.type, nport.Y)
+        maxerror = np.max(np.abs(result - shunt(self.z1.convert(nport.Y),
+                                                portsets)))
+        self.assertAlmostEqual(maxerror, 0, 14)
+
+    def test_shunt_matrix(self):
+        portsets = [3, (1, 4), 2]
+        for matrix in self.y1:
+            maxerror = np.max(np.abs(matrix.shunt(portsets) -
+                                     shunt(matrix[np.newaxis], portsets)[0]))
+            self.assertAlmostEqual(maxerror, 0, 14)
+
+    # parallel connection ------------------------------------------------------
+    def test_parallel_matrix(self):
+        other = nport.NPortMatrix([[0.5 + 1j, 0.2], [0.3, 0.4 - 0.5j]], nport.Y)
+        portmap = [2, 0, 0, 1]
+        for matrix in self.y1:
+            result = matrix.parallel(other, portmap)
+            self.assertEqual(result.type, nport.Y)
+            maxerror = np.max(np.abs(result - parallel(matrix, other,
+                                                       portmap)))
+            self.assertAlmostEqual(maxerror, 0, 14)
+
+    def test_parallel_matrix_impedance(self):
+        other = nport.NPortMatrix([[50, 10], [10, 60 + 5j]], nport.Z)
+        portmap = [0, 1, 2, 0]
+        for matrix in self.z1:
+            result = matrix.parallel(other, portmap)
+            self.assertEqual(result.type, nport.Y)
+            expected = parallel(matrix.convert(nport.Y),
+                                other.convert(nport.Y), portmap)
+            maxerror = np.max(np.abs(result - expected))
+            self.assertAlmostEqual(maxerror, 0, 14)
+
+    # passivity ----------------------------------------------------------------
+    def test_is_passive_matrix(self):
+        passive = np.array([[60, 10, 5], [10, 70, 10], [5, 10, 80]])
+        active = np.array([[-60, 10, 5], [10, 70, 10], [5, 10, 80]])
+        for matrix, expected in ((passive, True), (active, False)):
+            z = nport.NPortMatrix(matrix, nport.Z)
+            y = nport.NPortMatrix(np.linalg.inv(matrix), nport.Y)
+            self.assertEqual(z.is_passive(), expected)
+            self.assertEqual(y.is_passive(), expected)
+            self.assertEqual(z.convert(nport.S).is_passive(), expected)
+
+    def test_is_passive(self):
+        passive = np.array([[60, 10, 5], [10, 70, 10], [5, 10, 80]])
+        active = np.array([[-60, 10, 5], [10, 70, 10], [5, 10, 80]])
+        z = nport.NPort([1, 2, 3], [passive, passive, passive], nport.Z)
+        self.assertTrue(z.is_passive())
+        self.assertTrue(z.convert(nport.Y).is_passive())
+        z = nport.NPort([1, 2, 3], [passive, active, passive], nport.Z)
+        self.assertFalse(z.is_passive())
+        self.assertFalse(z.convert(nport.Y).is_passive())
+
+    # matrix multiplication ----------------------------------------------------
+    def test_dot_freqs(self):
+        other = nport.NPort([1.5, 2.5, 3, 4], self.y1[[0, 1, 2, 0]], nport.Z)
+        result = nport.dot(self.z1, other)
+        self.assertEqual(list(result.freqs), [1.5, 2, 2.5, 3])
+        result = nport.dot(other, self.z1)
+        self.assertEqual(list(result.freqs), [1.5, 2, 2.5, 3])
+
+    def test_dot_mismatched_freqs(self):
+        other = nport.NPort([1.5, 2.5, 3, 4], self.y1[[0, 1, 2, 0]], nport.Z)
+        freqs = [1.5, 2, 2.5, 3]
+        result = nport.dot(self.z1, other)
+        expected = [np.dot(a, b) for (a, b) in zip(interpolate(self.z1, freqs),
+                                                   interpolate(other, freqs))]
+        maxerror = np.max(np.abs(result - np.array(expected)))
+        self.assertAlmostEqual(maxerror, 0, 12)
+
+    def test_dot_array(self):
+        matrix = np.asarray(self.y1[1])
+        result = nport.dot(self.z1, matrix)
+        expected = [np.dot(a, matrix) for a in np.asarray(self.z1)]
+        maxerror = np.max(np.abs(result - np.array(expected)))
+        self.assertAlmostEqual(maxerror, 0, 12)
+
+    def test_dot_scalar(self):
+        result = nport.dot(self.z1, 2.0)
+        self.assertEqual(list(result.freqs), [1, 2, 3])
+        maxerror = np.max(np.abs(result - 2.0 * np.asarray(self.z1)))
+        self.assertAlmostEqual(maxerror, 0, 15)
+
+    # moving average -----------------------------------------------------------
+    def test_average(self):
+        z = nport.NPort(np.arange(7), np.random.rand(7, 4, 4) +
+                        1j * np.random.rand(7, 4, 4), nport.Z)
+        for n in (1, 2, 3, 4, 9):
+            maxerror = np.max(np.abs(z.average(n) - average(z, n)))
+            self.assertAlmostEqual(maxerror, 0, 14)
+
+    # adding frequency samples -------------------------------------------------
+    def test_add_list(self):
+        matrix = [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 16]]
+        result = self.z1.add(2.5, matrix)
+        self.assertEqual(list(result.freqs), [1, 2, 2.5, 3])
+        maxerror = max(np.max(np.abs(result[2] - np.array(matrix))),
+                       np.max(np.abs(result[[0, 1, 3]] - self.z1)))
+        self.assertAlmostEqual(maxerror, 0, 15)
+
+    def test_add_nportmatrix(self):
+        result = self.z1.add(0.5, self.y1[1])
+        self.assertEqual(list(result.freqs), [0.5, 1, 2, 3])
+        maxerror = max(np.max(np.abs(result[0] - self.y1[1].convert(nport.Z))),
+                       np.max(np.abs(result[1:] - self.z1)))
+        self.assertAlmostEqual(maxerror, 0, 15)
+
+    # 2n-port matrix -----------------------------------------------------------
+    def test_twonportmatrix_copies(self):
+        matrix = self.z1[0]
+        self.assertFalse(np.may_share_memory(matrix.twonportmatrix(), matrix))
+
+    def test_twonportmatrix_ports(self):
+        matrix = self.z1[0]
+        twonport = matrix.twonportmatrix((1, 3), (4, 2))
+        indices = [0, 2, 3, 1]
+        expected = np.asarray(matrix)[np.ix_(indices, indices)]
+        expected = expected.reshape(2, 2, 2, 2).swapaxes(1, 2)
+        maxerror = np.max(np.abs(twonport - expected))
+        self.assertAlmostEqual(maxerror, 0, 15)
+
 
 class TestTwoPort(unittest.TestCase):
     def setUp(self):
@@ -448,6 +683,66 @@ def renormalize(input, z0):
     maxerror = np.max(error)
     return maxerror
 
+def interpolate(input, freqs):
+    result = np.empty((len(freqs), ) + input.shape[1:], dtype=complex)
+    for i in range(input.ports):
+        for j in range(input.ports):
+            parameter = input.get_parameter(i + 1, j + 1)
+            result[:, i, j] = (np.interp(freqs, input.freqs, parameter.real) +
+                               1j * np.interp(freqs, input.freqs,
+                                              parameter.imag))
+    return result
+
+def average(input, n):
+    result = np.zeros(input.shape, dtype=complex)
+    for i in range(len(input)):
+        for j in range(- (n // 2), n - n // 2):
+            index = min(max(i + j, 0), len(input) - 1)
+            result[i] += input[index] / n
+    return result
+
+def recombine(input, portsets):
+    # signed sums of the impedances of the recombined ports
+    signed = []
+    for ports in portsets:
+        if isinstance(ports, tuple):
+            signed.append(((ports[0], 1), (ports[1], -1)))
+        else:
+            signed.append(((abs(ports), np.sign(ports)), ))
+    result = np.zeros((len(input), len(portsets), len(portsets)),
+                      dtype=complex)
+    for i, iports in enumerate(signed):
+        for j, jports in enumerate(signed):
+            for iport, isign in iports:
+                for jport, jsign in jports:
+                    result[:, i, j] += (isign * jsign *
+                                        np.asarray(input)[:, iport - 1,
+                                                          jport - 1])
+    return result
+
+def parallel(input, other, portmap):
+    # add the admittances of `other` between the ports given by `portmap`
+    result = np.array(input, dtype=complex)
+    for i, iport in enumerate(portmap):
+        for j, jport in enumerate(portmap):
+            if iport != 0 and jport != 0:
+                result[i, j] += other[iport - 1, jport - 1]
+    return result
+
+def shunt(input, portsets):
+    # sum the rows and columns of the admittances of connected ports
+    portsets = [ports if isinstance(ports, tuple) else (ports, )
+                for ports in portsets]
+    result = np.zeros((len(input), len(portsets), len(portsets)),
+                      dtype=complex)
+    for i, iports in enumerate(portsets):
+        for j, jports in enumerate(portsets):
+            for iport in iports:
+                for jport in jports:
+                    result[:, i, j] += np.asarray(input)[:, iport - 1,
+                                                         jport - 1]
+    return result
+
 
 if __name__ == '__main__':
     unittest.main()
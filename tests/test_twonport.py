@@ -2,6 +2,7 @@ import numpy as np
 import nport
 import unittest
 
+from nport import kernels
 from test_nport import convert, convert_same, renormalize
 from test_nport import convert_convert_renormalize, convert_renormalize_convert
 
@@ -203,6 +204,98 @@ class TestTwoNPort(unittest.TestCase):
         maxerror = renormalize(self.t1, 60)
         self.assertAlmostEqual(maxerror, 0, 12)
 
+    # conversion from NPort ----------------------------------------------------
+    def test_twonport_copies(self):
+        nport_ = self.z1.nport()
+        self.assertFalse(np.may_share_memory(nport_.twonport(), nport_))
+
+    def test_twonport_ports(self):
+        nport_ = self.z1.nport()
+        twonport = nport_.twonport((1, 3), (4, 2))
+        ports = [(1, 3), (4, 2)]
+        maxerror = 0
+        for i in range(2):
+            for j in range(2):
+                for k in range(2):
+                    for l in range(2):
+                        error = np.abs(twonport[:, i, j, k, l] -
+                                       nport_.get_parameter(ports[i][k],
+                                                            ports[j][l]))
+                        maxerror = max(maxerror, np.max(error))
+        self.assertAlmostEqual(maxerror, 0, 15)
+
+    # adding frequency samples -------------------------------------------------
+    def test_add_list(self):
+        matrix = [[[[1, 2], [3, 4]], [[5, 6], [7, 8]]],
+                  [[[9, 10], [11, 12]], [[13, 14], [15, 16]]]]
+        result = self.z1.add(3.5, matrix)
+        self.assertEqual(list(result.freqs), [1, 2, 3, 3.5])
+        maxerror = max(np.max(np.abs(result[3] - np.array(matrix))),
+                       np.max(np.abs(result[:3] - self.z1)))
+        self.assertAlmostEqual(maxerror, 0, 15)
+
+    def test_add_twonportmatrix(self):
+        result = self.z1.add(1.5, self.s1[2])
+        self.assertEqual(list(result.freqs), [1, 1.5, 2, 3])
+        maxerror = max(np.max(np.abs(result[1] - self.s1[2].convert(nport.Z))),
+                       np.max(np.abs(result[[0, 2, 3]] - self.z1)))
+        self.assertAlmostEqual(maxerror, 0, 15)
+
+    # block matrix multiplication ----------------------------------------------
+    def test_dot_below_kernel_size(self):
+        self.assertTrue(2 <= kernels.TWONPORT_DOT_MAX_SIZE)
+        maxerror = dot_fallback(random_twonport(2), random_twonport(2))
+        self.assertAlmostEqual(maxerror, 0, 12)
+
+    def test_dot_above_kernel_size(self):
+        n = kernels.TWONPORT_DOT_MAX_SIZE + 1
+        maxerror = dot_fallback(random_twonport(n), random_twonport(n))
+        self.assertAlmostEqual(maxerror, 0, 12)
+
+    def test_dot_mismatched_freqs(self):
+        other = nport.TwoNPort([0.5, 1.5, 3], self.y1, nport.Z)
+        freqs = [1, 1.5, 2, 3]
+        result = nport.dot(self.z1, other)
+        self.assertEqual(list(result.freqs), freqs)
+        expected = block_dot(np.asarray(self.z1.at(freqs)),
+                             np.asarray(other.at(freqs)))
+        maxerror = np.max(np.abs(result - expected))
+        self.assertAlmostEqual(maxerror, 0, 12)
+
+    def test_dot_kernel(self):
+        kernel = kernels.twonport_dot()
+        if kernel is None:
+            self.skipTest("numba is not available")
+        for n in (1, 2, kernels.TWONPORT_DOT_MAX_SIZE):
+            left = np.asarray(random_twonport(n))
+            right = np.asarray(random_twonport(n))
+            result = np.empty_like(left)
+            kernel(left, right, result)
+            maxerror = np.max(np.abs(result - block_dot(left, right)))
+            self.assertAlmostEqual(maxerror, 0, 12)
+
+
+def random_twonport(n):
+    shape = (3, 2, 2, n, n)
+    matrices = np.random.rand(*shape) + 1j * np.random.rand(*shape)
+    return nport.TwoNPort([1, 2, 3], matrices, nport.Z)
+
+def block_dot(left, right):
+    return np.einsum('fikab,fkjbc->fijac', left, right)
+
+def dot_fallback(left, right):
+    # compare the default code path with the numpy fallback
+    result = nport.dot(left, right)
+    max_size = kernels.TWONPORT_DOT_MAX_SIZE
+    kernels.TWONPORT_DOT_MAX_SIZE = 0
+    try:
+        fallback = nport.dot(left, right)
+    finally:
+        kernels.TWONPORT_DOT_MAX_SIZE = max_size
+    expected = block_dot(np.asarray(left), np.asarray(right))
+    return max(np.max(np.abs(result - expected)),
+               np.max(np.abs(fallback - expected)))
+
 
 if __name__ == '__main__':
     unittest.main()